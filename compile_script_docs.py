@@ -9,37 +9,99 @@
 # The optional command-line argument is used as target file,
 # e.g. `python compile_script_docs.py script_reference.html`.
 #
-# This script should run in both Python 2 and 3.
+# This script requires Python 3.6 or newer.
+import collections
+import html
+import io
 import re
 import os
 import sys
-
-# Use io.open instead of open to ignore text encoding errors in both
-# Python 2 and 3.
-import io
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from xml.etree import cElementTree as ElementTree
 except:
     from xml.etree import ElementTree
 
+RE_INCLUDE = re.compile(r'^# *include *[<"](.*)[>"]$')
+RE_DOC = re.compile(r"///(.*)")
+# All script registration macros are matched by a single alternation;
+# `lastgroup` tells which one matched.
+RE_SCRIPT_DEFINITION = re.compile(
+    "|".join(
+        [
+            r"(?P<cls>REGISTER_SCRIPT_CLASS\((?P<cls_name>[^\)]*)\))",
+            r"(?P<cls_nc>REGISTER_SCRIPT_CLASS_NO_CREATE\((?P<cls_nc_name>[^\)]*)\))",
+            r"(?P<sub>REGISTER_SCRIPT_SUBCLASS\((?P<sub_name>[^,]*),(?P<sub_parent>[^\)]*)\))",
+            r"(?P<sub_nc>REGISTER_SCRIPT_SUBCLASS_NO_CREATE\((?P<sub_nc_name>[^,]*),(?P<sub_nc_parent>[^\)]*)\))",
+            r"(?P<fn>REGISTER_SCRIPT_CLASS_FUNCTION\((?P<fn_class>[^,]*),(?P<fn_name>[^\)]*)\))",
+            r"(?P<cb>REGISTER_SCRIPT_CLASS_CALLBACK\((?P<cb_class>[^,]*),(?P<cb_name>[^\)]*)\))",
+            r"(?P<func>REGISTER_SCRIPT_FUNCTION\((?P<func_name>[^\)]*)\))",
+        ]
+    )
+)
+RE_CLASS = re.compile(r"^class ([a-zA-Z0-9]+)")
+RE_METHOD_DECL = re.compile(r"^ *([a-zA-Z0-9 \:\<\>]+) +([a-zA-Z0-9]+)\(([^\)]*)\)")
+RE_SCOPED_CALL = re.compile(r"([a-zA-Z0-9]+)::([a-zA-Z0-9]+)\(([^\)]*)\)")
+
+
+def escapeHtml(text):
+    return html.escape(text, quote=False).replace("\n", "<br>")
+
+
+class ScriptDocumented(object):
+    """Base for anything with a description; caches the HTML escaped form."""
+
+    def __init__(self):
+        self.description = ""
+
+    @property
+    def description(self):
+        return self._description
+
+    @description.setter
+    def description(self, description):
+        self._description = description
+        self._html_description = None
 
-class ScriptFunction(object):
+    @property
+    def html_description(self):
+        if self._html_description is None:
+            self._html_description = escapeHtml(self._description)
+        return self._html_description
+
+
+class ScriptFunction(ScriptDocumented):
     def __init__(self, name):
+        super(ScriptFunction, self).__init__()
         self.name = name
-        self.description = ""
         self.origin_class = None
         self.parameters = None
 
+    @property
+    def parameters(self):
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, parameters):
+        self._parameters = parameters
+        self._html_parameters = None
+
+    @property
+    def html_parameters(self):
+        if self._html_parameters is None and self._parameters is not None:
+            self._html_parameters = escapeHtml(self._parameters)
+        return self._html_parameters
+
     def __repr__(self):
         ret = self.name
         return "%s" % (ret)
 
 
-class ScriptMember(object):
+class ScriptMember(ScriptDocumented):
     def __init__(self, name):
+        super(ScriptMember, self).__init__()
         self.name = name
-        self.description = ""
         self.origin_class = None
 
     def __repr__(self):
@@ -47,12 +109,12 @@ class ScriptMember(object):
         return "%s" % (ret)
 
 
-class ScriptClass(object):
+class ScriptClass(ScriptDocumented):
     def __init__(self, name):
+        super(ScriptClass, self).__init__()
         self.name = name
         self.parent_name = None
         self.parent = None
-        self.description = ""
         self.children = []
         self.create = True
         self.functions = []
@@ -79,172 +141,134 @@ class ScriptClass(object):
             ret += ":%s" % (func)
         return "{%s}" % (ret)
 
-    def outputClassTree(self, stream):
-        stream.write('<li><a href="#class_%s">%s</a>\n' % (self.name, self.name))
-        if len(self.children) > 0:
-            stream.write("<ul>")
-            for c in self.children:
-                c.outputClassTree(stream)
-            stream.write("</ul>\n")
-
-
-class DocumentationGenerator(object):
-    def __init__(self):
-        self._definitions = []
-        self._function_info = []
-        self._files = set()
-
-    def addDirectory(self, directory):
-        if not os.path.isdir(directory):
-            return
-
-        for name in os.listdir(directory):
-            name = directory + os.sep + name
-            if os.path.isdir(name):
-                self.addDirectory(name)
-            elif os.path.isfile(name):
-                self.addFile(name)
-
-    def addFile(self, filename):
-        if filename in self._files:
-            return
-        if not os.path.isfile(filename):
-            return
-
-        self._files.add(filename)
-        ext = os.path.splitext(filename)[1].lower()
-        if ext == ".c" or ext == ".cpp" or ext == ".h":
-            for line in io.open(filename, "r", errors="ignore"):
-                m = re.match('^# *include *[<"](.*)[>"]$', line)
-                if m is not None:
-                    self.addFile(m.group(1))
-                    self.addFile(os.path.join(os.path.dirname(filename), m.group(1)))
-
-    def readFunctionInfo(self):
-        for filename in self._files:
-            if not filename.endswith(".h"):
+    def outputClassTree(self, w):
+        # Depth first walk with an explicit stack, a (node, True) entry closes
+        # the child list of that node.
+        stack = [(self, False)]
+        while stack:
+            node, close = stack.pop()
+            if close:
+                w("</ul>\n")
                 continue
+            w(f'<li><a href="#class_{node.name}">{node.name}</a>\n')
+            if len(node.children) > 0:
+                w("<ul>")
+                stack.append((node, True))
+                for c in reversed(node.children):
+                    stack.append((c, False))
+
+
+def readLines(filename):
+    # Universal newlines turn \r\n and \r into \n, splitting on \n only keeps
+    # characters like form feeds inside their line. Encoding errors are ignored.
+    with io.open(filename, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read().split("\n")
+
+
+# The per-file parser runs in worker processes, so it returns these picklable
+# records instead of Script* objects. The functions and callbacks lists of a
+# ParsedClass are filled in while the file is parsed.
+ParsedClass = collections.namedtuple(
+    "ParsedClass",
+    ["name", "parent_name", "description", "create", "functions", "callbacks"],
+)
+ParsedClassFunction = collections.namedtuple(
+    "ParsedClassFunction", ["name", "description", "origin_class"]
+)
+ParsedFunction = collections.namedtuple("ParsedFunction", ["name", "description"])
+
+
+def parseFile(filename, is_header):
+    # Function info is a list of (class name, function name, parameters), only
+    # collected from headers. Definitions are ParsedClass and ParsedFunction
+    # records in source order.
+    function_info = []
+    definitions = []
+    description = ""
+    header_class = None
+    current_class = None
+    for line in readLines(filename):
+        if not line:
             description = ""
-            current_class = None
-            with io.open(filename, "r", errors="ignore") as f:
-                for line in f:
-                    if line.startswith("#"):
-                        continue
-                    res = re.search("([a-zA-Z0-9]+)::([a-zA-Z0-9]+)\(([^\)]*)\)", line)
-                    if res != None:
-                        self._function_info.append(
-                            (res.group(1), res.group(2), res.group(3))
-                        )
-                    res = re.search("^class ([a-zA-Z0-9]+)", line)
+            continue
+        if line[0] == "#":
+            continue
+        if is_header:
+            if line.startswith("class "):
+                res = RE_CLASS.search(line)
+                if res != None:
+                    header_class = res.group(1)
+            # Both function patterns need an opening parenthesis.
+            if "(" in line:
+                if "::" in line:
+                    res = RE_SCOPED_CALL.search(line)
                     if res != None:
-                        current_class = res.group(1)
-                    if current_class is not None:
-                        res = re.search(
-                            "^ *([a-zA-Z0-9 \:\<\>]+) +([a-zA-Z0-9]+)\(([^\)]*)\)", line
-                        )
-                        if res != None and res.group(2) != "":
-                            self._function_info.append(
-                                (current_class, res.group(2), res.group(3))
-                            )
-
-    def readScriptDefinitions(self):
-        for filename in self._files:
+                        function_info.append((res.group(1), res.group(2), res.group(3)))
+                if header_class is not None:
+                    res = RE_METHOD_DECL.search(line)
+                    if res != None and res.group(2) != "":
+                        function_info.append((header_class, res.group(2), res.group(3)))
+        # Plain substring tests are much cheaper than a regex search
+        # and reject almost every line of C++ source.
+        # A documentation comment wins over any macro on the same line.
+        if "///" in line:
+            if description != "":
+                description += "\n"
+            description += RE_DOC.search(line).group(1)
+            continue
+        if "REGISTER_SCRIPT" not in line:
             description = ""
-            current_class = None
-            # print("Processing: %s" % (filename))
-            for line in io.open(filename, "r", errors="ignore"):
-                if line.startswith("#"):
-                    continue
-                res = re.search("///(.*)", line)
-                if res != None:
-                    if description != "":
-                        description += "\n"
-                    description += res.group(1)
-                    continue
-                res = re.search("REGISTER_SCRIPT_CLASS\(([^\)]*)\)", line)
-                if res != None:
-                    current_class = ScriptClass(res.group(1).strip())
-                    current_class.description = description
-                    self._definitions.append(current_class)
-                res = re.search("REGISTER_SCRIPT_CLASS_NO_CREATE\(([^\)]*)\)", line)
-                if res != None:
-                    current_class = ScriptClass(res.group(1).strip())
-                    current_class.create = False
-                    current_class.description = description
-                    self._definitions.append(current_class)
-                res = re.search("REGISTER_SCRIPT_SUBCLASS\(([^,]*),([^\)]*)\)", line)
-                if res != None:
-                    current_class = ScriptClass(res.group(1).strip())
-                    current_class.parent_name = res.group(2).strip()
-                    current_class.description = description
-                    self._definitions.append(current_class)
-                res = re.search(
-                    "REGISTER_SCRIPT_SUBCLASS_NO_CREATE\(([^,]*),([^\)]*)\)", line
+            continue
+        # Every macro on the line is handled, all with the same description.
+        for res in RE_SCRIPT_DEFINITION.finditer(line):
+            kind = res.lastgroup
+            if kind == "cls" or kind == "cls_nc":
+                current_class = ParsedClass(
+                    name=res.group(kind + "_name").strip(),
+                    parent_name=None,
+                    description=description,
+                    create=kind == "cls",
+                    functions=[],
+                    callbacks=[],
                 )
-                if res != None:
-                    current_class = ScriptClass(res.group(1).strip())
-                    current_class.parent_name = res.group(2).strip()
-                    current_class.create = False
-                    current_class.description = description
-                    self._definitions.append(current_class)
-
-                res = re.search(
-                    "REGISTER_SCRIPT_CLASS_FUNCTION\(([^,]*),([^\)]*)\)", line
+                definitions.append(current_class)
+            elif kind == "sub" or kind == "sub_nc":
+                current_class = ParsedClass(
+                    name=res.group(kind + "_name").strip(),
+                    parent_name=res.group(kind + "_parent").strip(),
+                    description=description,
+                    create=kind == "sub",
+                    functions=[],
+                    callbacks=[],
                 )
-                if res != None:
-                    func = current_class.addFunction(res.group(2).strip())
-                    func.description = description
-                    func.origin_class = res.group(1).strip()
-                res = re.search(
-                    "REGISTER_SCRIPT_CLASS_CALLBACK\(([^,]*),([^\)]*)\)", line
+                definitions.append(current_class)
+            elif kind == "fn":
+                current_class.functions.append(
+                    ParsedClassFunction(
+                        name=res.group("fn_name").strip(),
+                        description=description,
+                        origin_class=res.group("fn_class").strip(),
+                    )
                 )
-                if res != None:
-                    current_class.addCallback(res.group(2).strip())
-
-                res = re.search("REGISTER_SCRIPT_FUNCTION\(([^\)]*)\)", line)
-                if res != None:
-                    current_class = None
-                    self._definitions.append(ScriptFunction(res.group(1).strip()))
-                    self._definitions[-1].description = description
-                description = ""
-
-    def linkFunctions(self):
-        for class_name, function_name, parameters in self._function_info:
-            for definition in self._definitions:
-                if isinstance(definition, ScriptClass):
-                    for func in definition.functions:
-                        if (
-                            func.origin_class == class_name
-                        ) and func.name == function_name:
-                            func.parameters = parameters
-
-    def linkParents(self):
-        for definition in self._definitions:
-            if isinstance(definition, ScriptClass):
-                if definition.parent_name is not None:
-                    for d in self._definitions:
-                        if d.name == definition.parent_name:
-                            definition.parent = d
-                            d.children.append(definition)
-                    if definition.parent is None:
-                        print("Parent not found for: ", definition)
-                else:
-                    f = definition.addFunction("isValid")
-                    f.parameters = ""
-                    f.description = "Check if this is still looking at a valid object. Returns false when the objects that this variable references is destroyed."
-                    f = definition.addFunction("destroy")
-                    f.parameters = ""
-                    f.description = "Removes this object from the game."
-                    f = definition.addMember("typeName")
-                    f.description = 'Returns the class name of this object, this is not a function, but a direct member: if object.typeName == "Mine" then print("MINE!") end'
+            elif kind == "cb":
+                current_class.callbacks.append(res.group("cb_name").strip())
+            elif kind == "func":
+                current_class = None
+                definitions.append(
+                    ParsedFunction(
+                        name=res.group("func_name").strip(), description=description
+                    )
+                )
+        description = ""
+    return function_info, definitions
 
-    def generateDocs(self, stream):
-        stream.write('<!doctype html><html lang="us"><head><meta charset="utf-8"><title>EmptyEpsilon - Scripting documentation</title>')
-        stream.write('<link href="http://daid.github.io/EmptyEpsilon/jquery-ui.min.css" rel="stylesheet">')
-        stream.write('<link href="http://daid.github.io/EmptyEpsilon/main.css" rel="stylesheet">')
 
-        stream.write(
-            """
+# The static parts of the page are encoded once up front.
+HTML_HEADER = (
+    '<!doctype html><html lang="us"><head><meta charset="utf-8"><title>EmptyEpsilon - Scripting documentation</title>'
+    '<link href="http://daid.github.io/EmptyEpsilon/jquery-ui.min.css" rel="stylesheet">'
+    '<link href="http://daid.github.io/EmptyEpsilon/main.css" rel="stylesheet">'
+    """
 <link rel="preconnect" href="https://fonts.googleapis.com" />
 <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin />
 <link
@@ -328,115 +352,240 @@ rel="stylesheet"
   }
 </style>
 """
-        )
-
-        stream.write("</head>")
-        stream.write("<body>")
-
-        stream.write('<div class="ui-widget ui-widget-content ui-corner-all">')
-        stream.write("<h1>EmptyEpsilon Scripting Reference</h1>")
-        stream.write("<p>This is the EmptyEpsilon script reference for this version of EmptyEpsilon.</p>")
-        stream.write('<p>By no means this is a guide to help you scripting, you should check <a href="http://emptyepsilon.org/">emptyepsilon.org</a> for the guide on scripting. ')
-        stream.write("As well as check the already existing scenario and ship data files on how to get started.</p>")
-        stream.write("</div>\n")
-
-        # TODO modify the script and read the constants from the cpp files
-        stream.write('<div class="ui-widget ui-widget-content ui-corner-all">')
-        stream.write("<p>Some of the types in the parameters:</p>")
-        stream.write("<ul>\n")
-        stream.write('<li>ScriptSimpleCallback / function: Note that the callback function must reference something global, otherwise you get an error like "??[convert&lt;ScriptSimpleCallback&gt;::param] Upvalue 1 of function is not a table...". Use e.g. `math.abs(0) -- Provides global context for SeriousProton` to do nothing.</li>\n')
-        stream.write('<li>EAlertLevel: "Normal", "YELLOW ALERT", "RED ALERT" (<code>playerSpaceship.cpp</code>)</li>\n')
-        stream.write('<li>ECrewPosition: "Helms", "Weapons", "Engineering", "Science", "Relay", "Tactical", "Engineering+", "Operations", "Single", "DamageControl", "PowerManagement", "Database", "AltRelay", "CommsOnly", "ShipLog", (<code>playerInfo.cpp</code>)</li>\n')
-        stream.write('<li>EMissileSizes: "small", "medium", "large"</li>\n')
-        stream.write('<li>EMissileWeapons: "Homing", "Nuke", "Mine", "EMP", "HVLI" (<code>spaceship.cpp</code>)</li>\n')
-        stream.write('<li>EScannedState: "notscanned", "friendorfoeidentified", "simplescan", "fullscan" (<code>spaceObject.h</code>)</li>\n')
-        stream.write('<li>ESystem: "reactor", "beamweapons", "missilesystem", "maneuver", "impulse", "warp", "jumpdrive", "frontshield", "rearshield"</li>\n')
-        stream.write("<!--\n")
-        stream.write("<li>EMainScreenOverlay: TODO</li>\n")
-        stream.write("<li>EMainScreenSetting: TODO</li>\n")
-        stream.write("-->\n")
-        stream.write('<li>Factions: "Independent", "Kraylor", "Arlenians", "Exuari", "Ghosts", "Ktlitans", "TSN", "USN", "CUF" (<code>factionInfo.lua</code>)</li>\n')
-        stream.write("</ul>\n")
-        stream.write("<p>Note that most <code>SpaceObject</code>s directly switch to fully scanned, only <code>SpaceShips</code>s go through all the states.</p>")
-        stream.write("</div>\n")
-
-        stream.write('<div class="ui-widget ui-widget-content ui-corner-all">')
-        stream.write("<h2>Objects</h2>\n")
-        stream.write("<ul>")
+    "</head>"
+    "<body>"
+    '<div class="ui-widget ui-widget-content ui-corner-all">'
+    "<h1>EmptyEpsilon Scripting Reference</h1>"
+    "<p>This is the EmptyEpsilon script reference for this version of EmptyEpsilon.</p>"
+    '<p>By no means this is a guide to help you scripting, you should check <a href="http://emptyepsilon.org/">emptyepsilon.org</a> for the guide on scripting. '
+    "As well as check the already existing scenario and ship data files on how to get started.</p>"
+    "</div>\n"
+    # TODO modify the script and read the constants from the cpp files
+    '<div class="ui-widget ui-widget-content ui-corner-all">'
+    "<p>Some of the types in the parameters:</p>"
+    "<ul>\n"
+    '<li>ScriptSimpleCallback / function: Note that the callback function must reference something global, otherwise you get an error like "??[convert&lt;ScriptSimpleCallback&gt;::param] Upvalue 1 of function is not a table...". Use e.g. `math.abs(0) -- Provides global context for SeriousProton` to do nothing.</li>\n'
+    '<li>EAlertLevel: "Normal", "YELLOW ALERT", "RED ALERT" (<code>playerSpaceship.cpp</code>)</li>\n'
+    '<li>ECrewPosition: "Helms", "Weapons", "Engineering", "Science", "Relay", "Tactical", "Engineering+", "Operations", "Single", "DamageControl", "PowerManagement", "Database", "AltRelay", "CommsOnly", "ShipLog", (<code>playerInfo.cpp</code>)</li>\n'
+    '<li>EMissileSizes: "small", "medium", "large"</li>\n'
+    '<li>EMissileWeapons: "Homing", "Nuke", "Mine", "EMP", "HVLI" (<code>spaceship.cpp</code>)</li>\n'
+    '<li>EScannedState: "notscanned", "friendorfoeidentified", "simplescan", "fullscan" (<code>spaceObject.h</code>)</li>\n'
+    '<li>ESystem: "reactor", "beamweapons", "missilesystem", "maneuver", "impulse", "warp", "jumpdrive", "frontshield", "rearshield"</li>\n'
+    "<!--\n"
+    "<li>EMainScreenOverlay: TODO</li>\n"
+    "<li>EMainScreenSetting: TODO</li>\n"
+    "-->\n"
+    '<li>Factions: "Independent", "Kraylor", "Arlenians", "Exuari", "Ghosts", "Ktlitans", "TSN", "USN", "CUF" (<code>factionInfo.lua</code>)</li>\n'
+    "</ul>\n"
+    "<p>Note that most <code>SpaceObject</code>s directly switch to fully scanned, only <code>SpaceShips</code>s go through all the states.</p>"
+    "</div>\n"
+)
+HTML_HEADER_BYTES = HTML_HEADER.encode("utf-8")
+HTML_FOOTER = (
+    '<script src="http://daid.github.io/EmptyEpsilon/jquery.min.js"></script>'
+    '<script src="http://daid.github.io/EmptyEpsilon/jquery-ui.min.js"></script>'
+    "</body>"
+    "</html>"
+)
+HTML_FOOTER_BYTES = HTML_FOOTER.encode("utf-8")
+
+
+class DocumentationGenerator(object):
+    def __init__(self):
+        self._definitions = []
+        # Maps (class name, function name) to the parameter string, the last
+        # declaration seen wins.
+        self._function_info = {}
+        self._files = set()
+        self._not_found = set()
+
+    def addDirectory(self, directory):
+        # scandir gets the entry types from the directory listing itself, so
+        # most entries do not need a separate stat call.
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    self.addDirectory(entry.path)
+                elif entry.is_file():
+                    self.addFile(entry.path, is_file=True)
+
+    def addFile(self, filename, is_file=False):
+        if filename in self._files:
+            return
+        if not is_file and not self._isFile(filename):
+            return
+
+        # Included files are handled through a work list instead of recursion.
+        self._files.add(filename)
+        pending = [filename]
+        while pending:
+            filename = pending.pop()
+            ext = os.path.splitext(filename)[1].lower()
+            if ext == ".c" or ext == ".cpp" or ext == ".h":
+                directory = os.path.dirname(filename)
+                for line in readLines(filename):
+                    m = RE_INCLUDE.match(line)
+                    if m is None:
+                        continue
+                    # Use the include as given if it exists, otherwise relative
+                    # to this file.
+                    for include in (m.group(1), os.path.join(directory, m.group(1))):
+                        if include in self._files:
+                            break
+                        if self._isFile(include):
+                            self._files.add(include)
+                            pending.append(include)
+                            break
+
+    def _isFile(self, filename):
+        # Most includes are system headers that never resolve, remember those.
+        if filename in self._not_found:
+            return False
+        if not os.path.isfile(filename):
+            self._not_found.add(filename)
+            return False
+        return True
+
+    def readFiles(self):
+        files = list(self._files)
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(
+                parseFile,
+                files,
+                [f.endswith(".h") for f in files],
+                chunksize=16,
+            )
+            for function_info, definitions in results:
+                # Names come back from the workers as fresh strings, intern them
+                # here so the lookups in linkFunctions compare by identity.
+                for class_name, function_name, parameters in function_info:
+                    key = (sys.intern(class_name), sys.intern(function_name))
+                    self._function_info[key] = parameters
+                for entry in definitions:
+                    if isinstance(entry, ParsedClass):
+                        definition = ScriptClass(sys.intern(entry.name))
+                        if entry.parent_name is not None:
+                            definition.parent_name = sys.intern(entry.parent_name)
+                        definition.description = entry.description
+                        definition.create = entry.create
+                        for parsed_function in entry.functions:
+                            func = definition.addFunction(
+                                sys.intern(parsed_function.name)
+                            )
+                            func.description = parsed_function.description
+                            func.origin_class = sys.intern(parsed_function.origin_class)
+                        for callback_name in entry.callbacks:
+                            definition.addCallback(callback_name)
+                    else:
+                        definition = ScriptFunction(entry.name)
+                        definition.description = entry.description
+                    self._definitions.append(definition)
+
+    def linkFunctions(self):
+        for definition in self._definitions:
+            if isinstance(definition, ScriptClass):
+                for func in definition.functions:
+                    parameters = self._function_info.get((func.origin_class, func.name))
+                    if parameters is not None:
+                        func.parameters = parameters
+
+    def linkParents(self):
+        classes_by_name = {}
+        for definition in self._definitions:
+            if isinstance(definition, ScriptClass):
+                classes_by_name[definition.name] = definition
+        for definition in self._definitions:
+            if isinstance(definition, ScriptClass):
+                if definition.parent_name is not None:
+                    parent = classes_by_name.get(definition.parent_name)
+                    if parent is not None:
+                        definition.parent = parent
+                        parent.children.append(definition)
+                    if definition.parent is None:
+                        print("Parent not found for: ", definition)
+                else:
+                    f = definition.addFunction("isValid")
+                    f.parameters = ""
+                    f.description = "Check if this is still looking at a valid object. Returns false when the objects that this variable references is destroyed."
+                    f = definition.addFunction("destroy")
+                    f.parameters = ""
+                    f.description = "Removes this object from the game."
+                    f = definition.addMember("typeName")
+                    f.description = 'Returns the class name of this object, this is not a function, but a direct member: if object.typeName == "Mine" then print("MINE!") end'
+
+    def generateDocs(self, stream):
+        # Collect the generated fragments and write the whole page in one go.
+        buf = []
+        w = buf.append
+        w('<div class="ui-widget ui-widget-content ui-corner-all">')
+        w("<h2>Objects</h2>\n")
+        w("<ul>")
         for d in self._definitions:
             if isinstance(d, ScriptClass) and d.parent is None:
-                d.outputClassTree(stream)
-        stream.write("</ul>")
-        stream.write("</div>")
+                d.outputClassTree(w)
+        w("</ul>")
+        w("</div>")
 
-        stream.write('<div class="ui-widget ui-widget-content ui-corner-all">')
-        stream.write("<h2>Functions</h2>\n")
-        stream.write("<ul>")
+        w('<div class="ui-widget ui-widget-content ui-corner-all">')
+        w("<h2>Functions</h2>\n")
+        w("<ul>")
         for d in self._definitions:
             if isinstance(d, ScriptFunction):
-                stream.write("<li>%s" % (d.name))
-                stream.write(
-                    "<dd>%s</dd>"
-                    % (d.description.replace("<", "&lt;").replace("\n", "<br>"))
-                )
-        stream.write("</ul>")
-        stream.write("</div>")
+                w(f"<li>{d.name}")
+                w(f"<dd>{d.html_description}</dd>")
+        w("</ul>")
+        w("</div>")
 
         for d in self._definitions:
             if isinstance(d, ScriptClass):
-                stream.write('<div class="ui-widget ui-widget-content ui-corner-all">\n')
-                stream.write('<h2><a name="class_%s">%s</a></h2>\n' % (d.name, d.name))
-                stream.write(
-                    "<div>%s</div>"
-                    % (d.description.replace("<", "&lt;").replace("\n", "<br>"))
-                )
+                w('<div class="ui-widget ui-widget-content ui-corner-all">\n')
+                w(f'<h2><a name="class_{d.name}">{d.name}</a></h2>\n')
+                w(f"<div>{d.html_description}</div>")
                 if d.parent is not None:
-                    stream.write(
-                        'Subclass of: <a href="#class_%s">%s</a>'
-                        % (d.parent.name, d.parent.name)
+                    w(
+                        f'Subclass of: <a href="#class_{d.parent.name}">'
+                        f"{d.parent.name}</a>"
                     )
-                stream.write("<dl>")
+                w("<dl>")
                 for func in d.functions:
                     if func.parameters is None:
-                        stream.write(
-                            "<dt>%s:%s [NOT FOUND; see SeriousProton]</dt>"
-                            % (d.name, func.name)
+                        w(
+                            f"<dt>{d.name}:{func.name} "
+                            "[NOT FOUND; see SeriousProton]</dt>"
                         )
                         print("Failed to find parameters for %s:%s" % (d.name, func.name))
                     else:
-                        stream.write(
-                            "<dt>%s:%s(%s)</dt>"
-                            % (d.name, func.name, func.parameters.replace("<", "&lt;"))
-                        )
-                    stream.write(
-                        "<dd>%s</dd>"
-                        % (func.description.replace("<", "&lt;").replace("\n", "<br>"))
-                    )
+                        w(f"<dt>{d.name}:{func.name}({func.html_parameters})</dt>")
+                    w(f"<dd>{func.html_description}</dd>")
                 for member in d.members:
-                    stream.write("<dt>%s:%s</dt>" % (d.name, member.name))
-                    stream.write(
-                        "<dd>%s</dd>"
-                        % (member.description.replace("<", "&lt;").replace("\n", "<br>")
-                        )
-                    )
-                stream.write("</dl>")
-                stream.write("</div>")
+                    w(f"<dt>{d.name}:{member.name}</dt>")
+                    w(f"<dd>{member.html_description}</dd>")
+                w("</dl>")
+                w("</div>")
 
-        stream.write('<script src="http://daid.github.io/EmptyEpsilon/jquery.min.js"></script>')
-        stream.write('<script src="http://daid.github.io/EmptyEpsilon/jquery-ui.min.js"></script>')
-        stream.write("</body>")
-        stream.write("</html>")
+        body = "".join(buf)
+        if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+            stream.write(
+                b"".join([HTML_HEADER_BYTES, body.encode("utf-8"), HTML_FOOTER_BYTES])
+            )
+        else:
+            stream.write(HTML_HEADER + body + HTML_FOOTER)
 
 
 if __name__ == "__main__":
     dg = DocumentationGenerator()
     dg.addDirectory("src")
     dg.addDirectory("../SeriousProton/src")
-    dg.readFunctionInfo()
-    dg.readScriptDefinitions()
+    dg.readFiles()
     dg.linkFunctions()
     dg.linkParents()
     if len(sys.argv) > 1:
-        dg.generateDocs(open(sys.argv[1], "wt"))
+        with open(sys.argv[1], "wb") as f:
+            dg.generateDocs(f)
     else:
         dg.generateDocs(sys.stdout)
@@ -4,56 +4,77 @@ import glob
 import subprocess
 import json
 import os
+import threading
+from itertools import takewhile
+from concurrent.futures import ThreadPoolExecutor
+
+print_lock = threading.Lock()
+
+def log(message):
+    with print_lock:
+        print(message)
 
 def update_other_languages(base):
     assert base.endswith(".en.po")
     for other in glob.glob(base[:-5] + "*.po"):
         if other == base:
             continue
-        print("Merge %s -> %s" % (base, other))
+        log("Merge %s -> %s" % (base, other))
         cmd = ["msgmerge", "-U", other, base]
         subprocess.run(cmd, check=True)
 
+def read_bytes(filename):
+    # Compared as raw bytes, there is no need to decode the .po file.
+    with open(filename, "rb") as f:
+        return f.read()
 
-os.makedirs("scripts/locale", exist_ok=True)
-for scenario in glob.glob("scripts/scenario_*.lua"):
+def update_scenario(scenario):
     output = scenario.replace(".lua", ".en.po").replace("scripts/", "scripts/locale/")
     info = {}
     key = None
-    for line in open(scenario):
-        if not line.startswith("--"):
-            break
-        if line.startswith("---"):
-            if key is not None:
-                info[key] = info[key] + "\n" + line[3:].strip()
-        elif ":" in line:
-            key, _, value = line[2:].partition(":")
-            key = key.strip().lower()
-            value = value.strip()
-            info[key] = value
-    f = open(output, "wt")
+    # The scenario info is the block of comments at the top of the file.
+    with open(scenario, encoding="utf-8") as f:
+        for line in takewhile(lambda l: l.startswith("--"), f):
+            if line.startswith("---"):
+                if key is not None:
+                    info[key] = info[key] + "\n" + line[3:].strip()
+            elif ":" in line:
+                key, _, value = line[2:].partition(":")
+                key = key.strip().lower()
+                value = value.strip()
+                info[key] = value
+    header = ""
     if "name" in info:
-        f.write("# Scenario name\n")
-        f.write("msgid %s\n" % (json.dumps(info["name"])))
-        f.write("msgstr \"\"\n")
+        header += "# Scenario name\n"
+        header += "msgid %s\n" % (json.dumps(info["name"]))
+        header += "msgstr \"\"\n"
     if "description" in info:
-        f.write("# Scenario description\n")
-        f.write("msgid %s\n" % (json.dumps(info["description"].replace("\r", ""))))
-        f.write("msgstr \"\"\n")
-    f.close()
-    print(open(output, "rt").read())
+        header += "# Scenario description\n"
+        header += "msgid %s\n" % (json.dumps(info["description"].replace("\r", "")))
+        header += "msgstr \"\"\n"
+    with open(output, "wt") as f:
+        f.write(header)
+    log(header)
     cmd = ["xgettext", "--keyword=_:1c,2", "--keyword=_:1", "--omit-header", "-j", "-d", output[:-3], "-C", "-"]
     subprocess.run(cmd, check=True, input=b"")
-    pre = open(output, "rt").read()
+    pre = read_bytes(output)
     cmd = ["xgettext", "--keyword=_:1c,2", "--keyword=_:1", "--omit-header", "-j", "-d", output[:-3], scenario]
     subprocess.run(cmd, check=True)
-    post = open(output, "rt").read()
+    post = read_bytes(output)
     if pre == post:
         os.unlink(output)
-        print("Skipped %s" % (scenario))
+        log("Skipped %s" % (scenario))
     else:
         update_other_languages(output)
-        print("Done %s" % (scenario))
+        log("Done %s" % (scenario))
+
+
+os.makedirs("scripts/locale", exist_ok=True)
+# Each scenario only touches its own locale files, and the work is spent in
+# xgettext/msgmerge subprocesses, so the scenarios can be handled concurrently.
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    for _ in executor.map(update_scenario, glob.glob("scripts/scenario_*.lua")):
+        pass
 
 update_other_languages("resources/locale/main.en.po")
 update_other_languages("resources/locale/tutorial.en.po")